@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional
+
+WECHAT_MODEL_DIR_ENV = "QR_SORTER_WECHAT_MODEL_DIR"
+WECHAT_MODEL_FILES = (
+    "detect.prototxt",
+    "detect.caffemodel",
+    "sr.prototxt",
+    "sr.caffemodel",
+)
+
+Decoder = Callable[[object], List[str]]
+
+_local = threading.local()
+
+
+def _load_wechat_decoder(cv2) -> Optional[Decoder]:
+    model_dir = os.environ.get(WECHAT_MODEL_DIR_ENV)
+    if not model_dir or not hasattr(cv2, "wechat_qrcode_WeChatQRCode"):
+        return None
+
+    model_paths = [Path(model_dir) / name for name in WECHAT_MODEL_FILES]
+    if not all(p.is_file() for p in model_paths):
+        return None
+
+    try:
+        detector = cv2.wechat_qrcode_WeChatQRCode(*(str(p) for p in model_paths))
+    except Exception:
+        return None
+
+    def decode(gray_np) -> List[str]:
+        texts, _ = detector.detectAndDecode(gray_np)
+        return [t for t in texts if t]
+
+    return decode
+
+
+def _load_opencv_decoder(cv2) -> Optional[Decoder]:
+    try:
+        detector = cv2.QRCodeDetector()
+    except Exception:
+        return None
+
+    def decode(gray_np) -> List[str]:
+        ok, texts, _, _ = detector.detectAndDecodeMulti(gray_np)
+        if not ok:
+            return []
+        return [t for t in texts if t]
+
+    return decode
+
+
+def _load_decoder() -> Optional[Decoder]:
+    try:
+        import cv2
+    except ImportError:
+        return None
+
+    return _load_wechat_decoder(cv2) or _load_opencv_decoder(cv2)
+
+
+def decode_qr(gray) -> List[str]:
+    if not hasattr(_local, "decoder"):
+        _local.decoder = None
+        _local.decoder = _load_decoder()
+    decoder = _local.decoder
+    if decoder is None:
+        return []
+
+    import numpy as np
+
+    try:
+        return decoder(np.asarray(gray))
+    except Exception:
+        return []
+
+
+__all__ = [
+    "WECHAT_MODEL_DIR_ENV",
+    "decode_qr",
+]
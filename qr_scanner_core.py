@@ -2,13 +2,20 @@
 
 from __future__ import annotations
 
+import errno
 import os
+import queue
 import shutil
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Callable, Dict, List, Optional
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+from qr_backend import decode_qr
 
 IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".tif", ".gif", ".webp"}
+_IMAGE_EXTENSIONS_BYTES = frozenset(ext.encode("ascii") for ext in IMAGE_EXTENSIONS)
 
 
 class QRDependencyError(RuntimeError):
@@ -54,43 +61,128 @@ LogCallback = Callable[[str, Path], None]
 CancelCallback = Callable[[], bool]
 
 
-def iter_image_files(root: Path, recursive: bool) -> List[Path]:
-    files: List[Path] = []
-    if recursive:
-        for dirpath, _, filenames in os.walk(root):
-            d = Path(dirpath)
-            for name in filenames:
-                ext = Path(name).suffix.lower()
-                if ext in IMAGE_EXTENSIONS:
-                    files.append(d / name)
-    else:
-        for entry in root.iterdir():
-            if entry.is_file() and entry.suffix.lower() in IMAGE_EXTENSIONS:
-                files.append(entry)
-    return files
+def iter_image_files(root: Path, recursive: bool) -> Iterator[Path]:
+    root_dir = os.fsencode(root)
+    stack = [root_dir]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except OSError as e:
+            if d == root_dir:
+                e.filename = os.fsdecode(d)
+                raise
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append(entry.path)
+                    elif entry.is_file():
+                        name = entry.name
+                        dot = name.rfind(b".")
+                        if dot >= 0 and name[dot:].lower() in _IMAGE_EXTENSIONS_BYTES:
+                            yield Path(os.fsdecode(entry.path))
+                except OSError:
+                    continue
+
+
+_WALK_DONE = object()
+
+
+def _put_unless_stopped(
+    paths: "queue.Queue[object]", item: object, stop: threading.Event
+) -> bool:
+    while not stop.is_set():
+        try:
+            paths.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _walk_into_queue(
+    root: Path,
+    recursive: bool,
+    paths: "queue.Queue[object]",
+    stop: threading.Event,
+) -> None:
+    try:
+        for path in iter_image_files(root, recursive):
+            if not _put_unless_stopped(paths, path, stop):
+                return
+    except Exception as e:
+        _put_unless_stopped(paths, e, stop)
+        return
+    _put_unless_stopped(paths, _WALK_DONE, stop)
+
+
+def _candidate_path(dest_dir: Path, src: Path, counter: int) -> Path:
+    if counter == 0:
+        return dest_dir / src.name
+    return dest_dir / f"{src.stem}_{counter}{src.suffix}"
+
+
+def _claim_destination(dest_dir: Path, src: Path, counter: int) -> Tuple[Path, int]:
+    while True:
+        candidate = _candidate_path(dest_dir, src, counter)
+        try:
+            fd = os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            counter += 1
+            continue
+        os.close(fd)
+        return candidate, counter
+
+
+def _probe_destination(dest_dir: Path, src: Path, counter: int) -> Tuple[Path, int]:
+    candidate = _candidate_path(dest_dir, src, counter)
+    while candidate.exists():
+        counter += 1
+        candidate = _candidate_path(dest_dir, src, counter)
+    return candidate, counter
 
 
 def safe_move_with_suffix(
     src: Path,
     dest_dir: Path,
     preserve_timestamps: bool,
+    created_dirs: Optional[Set[Path]] = None,
+    next_suffix: Optional[Dict[Tuple[Path, str], int]] = None,
 ) -> Path:
-    dest_dir.mkdir(parents=True, exist_ok=True)
+    if created_dirs is None or dest_dir not in created_dirs:
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        if created_dirs is not None:
+            created_dirs.add(dest_dir)
 
-    base = src.name
-    stem = src.stem
-    suffix = src.suffix
+    stat_res = src.stat()
 
-    candidate = dest_dir / base
-    counter = 1
-    while candidate.exists():
-        candidate = dest_dir / f"{stem}_{counter}{suffix}"
-        counter += 1
+    suffix_key = (dest_dir, src.name)
+    counter = next_suffix.get(suffix_key, 0) if next_suffix is not None else 0
 
-    stat_res = src.stat()
+    claimed = os.name != "nt"
+    if claimed:
+        candidate, counter = _claim_destination(dest_dir, src, counter)
+    else:
+        candidate, counter = _probe_destination(dest_dir, src, counter)
 
-    moved_path_str = shutil.move(str(src), str(candidate))
-    moved_path = Path(moved_path_str)
+    try:
+        try:
+            os.replace(src, candidate)
+            moved_path = candidate
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            moved_path = Path(shutil.move(str(src), str(candidate)))
+    except BaseException:
+        if claimed:
+            candidate.unlink(missing_ok=True)
+        raise
+
+    if next_suffix is not None:
+        next_suffix[suffix_key] = counter + 1
 
     if preserve_timestamps:
         os.utime(
@@ -101,6 +193,135 @@ def safe_move_with_suffix(
     return moved_path
 
 
+_DRAFT_MIN_SIDE = 1024
+
+_IMAGE_MAGIC = (
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+    (b"BM", "BMP"),
+    (b"II*\x00", "TIFF"),
+    (b"MM\x00*", "TIFF"),
+    (b"II+\x00", "TIFF"),
+    (b"MM\x00+", "TIFF"),
+)
+
+
+def _sniff(f: BinaryIO) -> Optional[str]:
+    header = f.read(16)
+    f.seek(0)
+    for magic, fmt in _IMAGE_MAGIC:
+        if header.startswith(magic):
+            return fmt
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "WEBP"
+    return None
+
+
+def _otsu_threshold(histogram: List[int]) -> int:
+    total = sum(histogram)
+    sum_all = sum(i * count for i, count in enumerate(histogram))
+    sum_bg = 0
+    weight_bg = 0
+    best_threshold = 0
+    best_variance = 0.0
+    for t, count in enumerate(histogram):
+        weight_bg += count
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += t * count
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        variance = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if variance > best_variance:
+            best_variance = variance
+            best_threshold = t
+    return best_threshold
+
+
+def _enhanced_variants(gray) -> Iterator:
+    from PIL import ImageOps
+
+    yield ImageOps.invert(gray)
+    threshold = _otsu_threshold(gray.histogram())
+    yield gray.point(lambda v: 255 if v > threshold else 0)
+    yield ImageOps.equalize(gray)
+
+
+def _zbar_decode(gray) -> List[str]:
+    from pyzbar import pyzbar
+
+    width, height = gray.size
+    buf = gray.tobytes()
+    symbols = pyzbar.decode((buf, width, height))
+    del buf
+
+    values: List[str] = []
+    for d in symbols:
+        try:
+            values.append(d.data.decode("utf-8", errors="replace"))
+        except Exception:
+            values.append(repr(d.data))
+    return values
+
+
+def _decode_values(gray) -> List[str]:
+    return decode_qr(gray) or _zbar_decode(gray)
+
+
+def _decode_enhanced(gray) -> List[str]:
+    for variant in _enhanced_variants(gray):
+        decoded = _zbar_decode(variant)
+        if decoded:
+            return decoded
+    return []
+
+
+def _load_gray(path: str, downscale: bool):
+    from PIL import Image, UnidentifiedImageError
+
+    with open(path, "rb") as f:
+        fmt = _sniff(f)
+        try:
+            img = Image.open(f, formats=[fmt] if fmt else None)
+        except UnidentifiedImageError:
+            raise UnidentifiedImageError(
+                f"cannot identify image file {path!r}"
+            ) from None
+        with img:
+            if fmt is None:
+                fmt = img.format
+            scale = 1
+            if fmt == "JPEG":
+                if downscale:
+                    scale = -(-min(img.size) // _DRAFT_MIN_SIDE)
+                img.draft("L", (img.width // scale, img.height // scale))
+            return img.convert("L"), scale
+
+
+def _decode_file(path: str) -> Tuple[str, Optional[List[str]], Optional[str]]:
+    try:
+        gray, scale = _load_gray(path, downscale=True)
+    except Exception as e:
+        return path, None, str(e)
+
+    decoded = _decode_values(gray)
+    if not decoded:
+        decoded = _decode_enhanced(gray)
+    del gray
+
+    if not decoded and scale > 1:
+        gray, _ = _load_gray(path, downscale=False)
+        decoded = _decode_values(gray)
+        del gray
+
+    return path, decoded, None
+
+
 def scan_and_move_qr(
     root: Path,
     options: ScanOptions,
@@ -109,20 +330,17 @@ def scan_and_move_qr(
     is_cancelled: Optional[CancelCallback] = None,
 ) -> Dict[str, int]:
     _ensure_qr_dependencies()
-    from pyzbar import pyzbar
-    from PIL import Image
 
     root = root.resolve()
-    files = iter_image_files(root, options.recursive)
-    total = len(files)
 
     stats = {
-        "total": total,
+        "total": 0,
         "with_qr": 0,
         "moved": 0,
         "no_qr": 0,
         "errors": 0,
         "skipped": 0,
+        "partial": 0,
     }
 
     def log(message: str, file_path: Path):
@@ -135,11 +353,14 @@ def scan_and_move_qr(
             log_dir = root
         on_log(message, log_dir)
 
-    for idx, path in enumerate(files, start=1):
-        if is_cancelled is not None and is_cancelled():
-            stats["skipped"] += total - idx + 1
-            break
+    def cancelled() -> bool:
+        return is_cancelled is not None and is_cancelled()
 
+    def handle_decoded(
+        path: Path,
+        qr_values: Optional[List[str]],
+        open_error: Optional[str],
+    ) -> FileScanResult:
         result = FileScanResult(
             src_path=path,
             had_qr=False,
@@ -149,89 +370,172 @@ def scan_and_move_qr(
             qr_values=None,
         )
 
-        try:
+        if open_error is not None:
+            result.error = open_error
+            stats["errors"] += 1
+            log(f"ERROR: Cannot open image {path}: {open_error}", path)
+            return result
+
+        if not qr_values:
+            stats["no_qr"] += 1
+            log(f"NO QR: {path}", path)
+            return result
+
+        result.had_qr = True
+        stats["with_qr"] += 1
+        result.qr_values = qr_values
+
+        dest_dir = path.parent / "qr"
+
+        if options.dry_run:
+            msg = f"DRY RUN: Would move {path} -> {dest_dir}"
+            log(msg, path)
+        else:
             try:
-                img = Image.open(path)
+                moved_path = safe_move_with_suffix(
+                    path,
+                    dest_dir,
+                    options.preserve_timestamps,
+                    created_dirs=created_dirs,
+                    next_suffix=next_suffix,
+                )
+                result.moved = True
+                result.dest_path = moved_path
+                moved_into.add(moved_path)
+                stats["moved"] += 1
+                msg = f"MOVED: {path} -> {moved_path}"
+                log(msg, path)
             except Exception as e:
-                msg = f"ERROR: Cannot open image {path}: {e}"
                 result.error = str(e)
                 stats["errors"] += 1
+                msg = f"ERROR: Failed to move {path}: {e}"
                 log(msg, path)
-                if on_progress:
-                    on_progress(idx, total, result)
-                continue
 
+        if options.dry_run and result.dest_path is None:
+            hypothetical = dest_dir / path.name
+            result.dest_path = hypothetical
+
+        return result
+
+    paths: "queue.Queue[object]" = queue.Queue(maxsize=256)
+    stop = threading.Event()
+    walker = threading.Thread(
+        target=_walk_into_queue,
+        args=(root, options.recursive, paths, stop),
+        daemon=True,
+    )
+    walker.start()
+
+    workers = min(32, (os.cpu_count() or 1) * 2)
+    max_in_flight = 2 * workers
+    discovered = 0
+    processed = 0
+    walk_done = False
+    pending: Dict[Future, Path] = {}
+    moved_into: Set[Path] = set()
+    created_dirs: Set[Path] = set()
+    next_suffix: Dict[Tuple[Path, str], int] = {}
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while not cancelled() and (pending or not walk_done):
+                while not walk_done and len(pending) < max_in_flight:
+                    try:
+                        if pending:
+                            item = paths.get_nowait()
+                        else:
+                            item = paths.get(timeout=0.1)
+                    except queue.Empty:
+                        break
+                    if item is _WALK_DONE:
+                        walk_done = True
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    if item in moved_into:
+                        continue
+                    discovered += 1
+                    pending[executor.submit(_decode_file, str(item))] = item
+
+                if not pending:
+                    continue
+
+                done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    processed += 1
+
+                    try:
+                        _, qr_values, open_error = future.result()
+                        result = handle_decoded(path, qr_values, open_error)
+                    except Exception as e:
+                        result = FileScanResult(
+                            src_path=path,
+                            had_qr=False,
+                            moved=False,
+                            dest_path=None,
+                            error=str(e),
+                            qr_values=None,
+                        )
+                        stats["errors"] += 1
+                        log(f"ERROR: Unexpected error processing {path}: {e}", path)
+
+                    if on_progress:
+                        on_progress(processed, discovered if walk_done else 0, result)
+
+            for future in pending:
+                future.cancel()
+    finally:
+        stop.set()
+
+    if not walk_done:
+        while True:
             try:
-                decoded = pyzbar.decode(img)
-            finally:
-                img.close()
-
-            if not decoded:
-                stats["no_qr"] += 1
-                log(f"NO QR: {path}", path)
-                if on_progress:
-                    on_progress(idx, total, result)
-                continue
-
-            result.had_qr = True
-            stats["with_qr"] += 1
-            qr_values = []
-            for d in decoded:
-                try:
-                    qr_values.append(d.data.decode("utf-8", errors="replace"))
-                except Exception:
-                    qr_values.append(repr(d.data))
-            result.qr_values = qr_values
+                item = paths.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, Path) and item not in moved_into:
+                discovered += 1
 
-            dest_dir = path.parent / "qr"
+    stats["total"] = discovered
+    stats["skipped"] = discovered - processed
+    stats["partial"] = int(not walk_done)
 
-            if options.dry_run:
-                msg = f"DRY RUN: Would move {path} -> {dest_dir}"
-                log(msg, path)
-            else:
-                try:
-                    moved_path = safe_move_with_suffix(
-                        path, dest_dir, options.preserve_timestamps
-                    )
-                    result.moved = True
-                    result.dest_path = moved_path
-                    stats["moved"] += 1
-                    msg = f"MOVED: {path} -> {moved_path}"
-                    log(msg, path)
-                except Exception as e:
-                    result.error = str(e)
-                    stats["errors"] += 1
-                    msg = f"ERROR: Failed to move {path}: {e}"
-                    log(msg, path)
-
-            if options.dry_run and result.dest_path is None:
-                hypothetical = dest_dir / path.name
-                result.dest_path = hypothetical
-
-        except Exception as e:
-            result.error = str(e)
-            stats["errors"] += 1
-            log(f"ERROR: Unexpected error processing {path}: {e}", path)
+    return stats
 
-        if on_progress:
-            on_progress(idx, total, result)
 
-    return stats
+class LogWriter:
 
+    def __init__(self, buffer_size: int = 4096, max_open: int = 64):
+        self.buffer_size = buffer_size
+        self.max_open = max_open
+        self._files: Dict[Path, TextIO] = {}
 
-def append_log_line(log_dir: Path, line: str) -> None:
-    log_dir.mkdir(parents=True, exist_ok=True)
-    log_path = log_dir / "qrscan.log"
-    with log_path.open("a", encoding="utf-8") as f:
+    def write(self, log_dir: Path, line: str) -> None:
+        f = self._files.get(log_dir)
+        if f is None:
+            if len(self._files) >= self.max_open:
+                oldest = next(iter(self._files))
+                self._files.pop(oldest).close()
+            log_dir.mkdir(parents=True, exist_ok=True)
+            log_path = log_dir / "qrscan.log"
+            f = log_path.open("a", encoding="utf-8", buffering=self.buffer_size)
+            self._files[log_dir] = f
         f.write(line.rstrip("\n") + "\n")
 
+    def close_all(self) -> None:
+        files = self._files
+        self._files = {}
+        for f in files.values():
+            f.close()
+
 
 __all__ = [
     "ScanOptions",
     "FileScanResult",
     "scan_and_move_qr",
     "safe_move_with_suffix",
-    "append_log_line",
+    "LogWriter",
     "QRDependencyError",
 ]
 
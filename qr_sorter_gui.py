@@ -2,17 +2,24 @@
 
 from __future__ import annotations
 
+import os
 import sys
+import time
 from pathlib import Path
 from typing import List, Optional
 
 from PyQt6.QtCore import (
     QObject,
+    QRunnable,
+    QSize,
     Qt,
     QThread,
+    QThreadPool,
+    QTimer,
     pyqtSignal,
+    pyqtSlot,
 )
-from PyQt6.QtGui import QPixmap
+from PyQt6.QtGui import QImage, QPixmap, QPixmapCache
 from PyQt6.QtWidgets import (
     QApplication,
     QCheckBox,
@@ -26,11 +33,11 @@ from PyQt6.QtWidgets import (
     QListWidgetItem,
     QMainWindow,
     QMessageBox,
+    QPlainTextEdit,
     QPushButton,
     QProgressBar,
     QSplitter,
     QStatusBar,
-    QTextEdit,
     QVBoxLayout,
     QWidget,
 )
@@ -38,15 +45,19 @@ from PyQt6.QtWidgets import (
 from qr_scanner_core import (
     QRDependencyError,
     FileScanResult,
+    LogWriter,
     ScanOptions,
-    append_log_line,
     scan_and_move_qr,
 )
 
 
+PROGRESS_BATCH_SIZE = 32
+PROGRESS_BATCH_INTERVAL_S = 0.1
+
+
 class ScanWorker(QObject):
 
-    progress = pyqtSignal(int, int, FileScanResult)
+    progress_batch = pyqtSignal(int, int, list)
     log_line = pyqtSignal(str)
     finished = pyqtSignal(dict)
     error = pyqtSignal(str)
@@ -65,23 +76,47 @@ class ScanWorker(QObject):
         return self._cancel_requested
 
     def run(self) -> None:
+        log_writer = LogWriter()
+        batch: List[FileScanResult] = []
+        batch_current = 0
+        batch_total = 0
+        last_emit = time.monotonic()
+
+        def flush_progress() -> None:
+            nonlocal batch, last_emit
+            if batch:
+                self.progress_batch.emit(batch_current, batch_total, batch)
+                batch = []
+            last_emit = time.monotonic()
+
         try:
             def on_log(message: str, log_dir: Path) -> None:
-                append_log_line(log_dir, message)
+                log_writer.write(log_dir, message)
                 self.log_line.emit(message)
 
             def on_progress(
                 current: int, total: int, result: FileScanResult
             ) -> None:
-                self.progress.emit(current, total, result)
-
-            stats = scan_and_move_qr(
-                self.root,
-                self.options,
-                on_progress=on_progress,
-                on_log=on_log,
-                is_cancelled=self._is_cancelled,
-            )
+                nonlocal batch_current, batch_total
+                batch.append(result)
+                batch_current = current
+                batch_total = total
+                if (
+                    len(batch) >= PROGRESS_BATCH_SIZE
+                    or time.monotonic() - last_emit >= PROGRESS_BATCH_INTERVAL_S
+                ):
+                    flush_progress()
+
+            try:
+                stats = scan_and_move_qr(
+                    self.root,
+                    self.options,
+                    on_progress=on_progress,
+                    on_log=on_log,
+                    is_cancelled=self._is_cancelled,
+                )
+            finally:
+                flush_progress()
 
             if self._cancel_requested:
                 self.cancelled.emit(stats)
@@ -91,14 +126,55 @@ class ScanWorker(QObject):
             self.error.emit(str(e))
         except Exception as e:
             self.error.emit(f"Unexpected error: {e}")
+        finally:
+            log_writer.close_all()
+
+
+THUMBNAIL_SIZE = 64
+THUMBNAIL_CACHE_LIMIT_KB = 65536
+RESULT_ROW_HEIGHT = THUMBNAIL_SIZE + 4
+RESULT_FLUSH_INTERVAL_MS = 50
+LOG_MAX_LINES = 500
+
+
+class ThumbnailSignals(QObject):
+
+    done = pyqtSignal(QImage)
+
+
+class ThumbnailTask(QRunnable):
+
+    def __init__(self, path: Path):
+        super().__init__()
+        self.path = path
+        self.signals = ThumbnailSignals()
+
+    def run(self) -> None:
+        image = QImage(str(self.path))
+        if not image.isNull():
+            image = image.scaled(
+                THUMBNAIL_SIZE,
+                THUMBNAIL_SIZE,
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.SmoothTransformation,
+            )
+        self.signals.done.emit(image)
+
+
+def _thumbnail_cache_key(path: Path) -> Optional[str]:
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    return f"{path}:{mtime_ns}:{THUMBNAIL_SIZE}"
 
 
 class ResultItemWidget(QWidget):
 
-    def __init__(self, result: FileScanResult, root: Path, parent: Optional[QWidget] = None):
+    def __init__(self, result: FileScanResult, root_prefix: str, parent: Optional[QWidget] = None):
         super().__init__(parent)
         self.result = result
-        self.root = root
+        self.root_prefix = root_prefix
         self._setup_ui()
 
     def _setup_ui(self) -> None:
@@ -107,21 +183,29 @@ class ResultItemWidget(QWidget):
         layout.setSpacing(8)
 
         thumb_label = QLabel()
-        thumb_label.setFixedSize(64, 64)
+        thumb_label.setFixedSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE)
         thumb_label.setScaledContents(True)
-        pix = QPixmap(str(self.result.src_path))
-        if pix.isNull():
-            thumb_label.setText("No\nPreview")
-            thumb_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        thumb_label.setText("Loading…")
+        thumb_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.thumb_label = thumb_label
+
+        image_path = self.result.dest_path if self.result.moved else self.result.src_path
+        self._thumb_key = _thumbnail_cache_key(image_path)
+        cached = QPixmapCache.find(self._thumb_key) if self._thumb_key else None
+        if cached is not None:
+            thumb_label.setPixmap(cached)
         else:
-            thumb_label.setPixmap(pix.scaled(64, 64, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
+            task = ThumbnailTask(image_path)
+            task.signals.done.connect(self._on_thumbnail_loaded)
+            QThreadPool.globalInstance().start(task)
 
         text_layout = QVBoxLayout()
 
         fname_label = QLabel(self.result.src_path.name)
         fname_label.setStyleSheet("font-weight: bold;")
 
-        rel_path = str(self.result.src_path.relative_to(self.root)) if self.result.src_path.is_relative_to(self.root) else str(self.result.src_path)
+        src_str = str(self.result.src_path)
+        rel_path = src_str[len(self.root_prefix):] if src_str.startswith(self.root_prefix) else src_str
         path_label = QLabel(rel_path)
         path_label.setStyleSheet("color: #555555;")
 
@@ -155,6 +239,16 @@ class ResultItemWidget(QWidget):
         layout.addWidget(thumb_label)
         layout.addLayout(text_layout)
 
+    @pyqtSlot(QImage)
+    def _on_thumbnail_loaded(self, image: QImage) -> None:
+        if image.isNull():
+            self.thumb_label.setText("No\nPreview")
+        else:
+            pix = QPixmap.fromImage(image)
+            if self._thumb_key:
+                QPixmapCache.insert(self._thumb_key, pix)
+            self.thumb_label.setPixmap(pix)
+
 
 class MainWindow(QMainWindow):
 
@@ -234,15 +328,18 @@ class MainWindow(QMainWindow):
         results_layout = QVBoxLayout(results_box)
         self.results_list = QListWidget()
         self.results_list.setSelectionMode(QListWidget.SelectionMode.SingleSelection)
+        self.results_list.verticalScrollBar().valueChanged.connect(self._materialize_visible_results)
+        self.results_list.verticalScrollBar().rangeChanged.connect(self._materialize_visible_results)
         results_layout.addWidget(self.results_list)
 
         splitter.addWidget(results_box)
 
-        log_box = QGroupBox("Log (last 500 lines)")
+        log_box = QGroupBox(f"Log (last {LOG_MAX_LINES} lines)")
         log_layout = QVBoxLayout(log_box)
-        self.log_view = QTextEdit()
+        self.log_view = QPlainTextEdit()
         self.log_view.setReadOnly(True)
         self.log_view.setMinimumHeight(120)
+        self.log_view.setMaximumBlockCount(LOG_MAX_LINES)
         log_layout.addWidget(self.log_view)
 
         splitter.addWidget(log_box)
@@ -253,17 +350,16 @@ class MainWindow(QMainWindow):
 
         self.setStatusBar(QStatusBar())
 
-        self._log_buffer: List[str] = []
-        self._current_total = 0
+        self._current_processed = 0
+        self._scan_root_prefix = ""
+
+        self._pending_results: List[FileScanResult] = []
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(RESULT_FLUSH_INTERVAL_MS)
+        self._flush_timer.timeout.connect(self._flush_results)
 
     def append_log(self, line: str) -> None:
-        self._log_buffer.append(line)
-        if len(self._log_buffer) > 500:
-            self._log_buffer = self._log_buffer[-500:]
-        self.log_view.setPlainText("\n".join(self._log_buffer))
-        self.log_view.verticalScrollBar().setValue(
-            self.log_view.verticalScrollBar().maximum()
-        )
+        self.log_view.appendPlainText(line)
 
     def select_folder(self) -> None:
         dlg = QFileDialog(self, "Select folder to scan")
@@ -295,9 +391,12 @@ class MainWindow(QMainWindow):
         )
 
         self.results_list.clear()
-        self._log_buffer.clear()
+        self._pending_results.clear()
+        self._scan_root_prefix = os.path.join(str(root.resolve()), "")
         self.log_view.clear()
+        self.progress_bar.setMaximum(100)
         self.progress_bar.setValue(0)
+        self._current_processed = 0
         self.status_label.setText("Starting scan…")
         self.scan_btn.setEnabled(False)
         self.stop_btn.setEnabled(True)
@@ -308,7 +407,7 @@ class MainWindow(QMainWindow):
         self._worker.moveToThread(self._thread)
 
         self._thread.started.connect(self._worker.run)
-        self._worker.progress.connect(self.on_progress)
+        self._worker.progress_batch.connect(self.on_progress_batch)
         self._worker.log_line.connect(self.append_log)
         self._worker.finished.connect(self.on_finished)
         self._worker.cancelled.connect(self.on_cancelled)
@@ -318,6 +417,7 @@ class MainWindow(QMainWindow):
         self._worker.cancelled.connect(self._cleanup_thread)
         self._worker.error.connect(self._cleanup_thread)
 
+        self._flush_timer.start()
         self._thread.start()
 
     def stop_scan(self) -> None:
@@ -327,6 +427,9 @@ class MainWindow(QMainWindow):
             self.statusBar().showMessage("Stopping (will finish current file)…")
 
     def _cleanup_thread(self, *_args) -> None:
+        self._flush_timer.stop()
+        self._flush_results()
+        self.progress_bar.setMaximum(100)
         self.stop_btn.setEnabled(False)
         self.scan_btn.setEnabled(True)
         self.statusBar().clearMessage()
@@ -337,21 +440,63 @@ class MainWindow(QMainWindow):
         self._thread = None
         self._worker = None
 
-    def on_progress(self, current: int, total: int, result: FileScanResult) -> None:
-        self._current_total = total
+    def on_progress_batch(
+        self, current: int, total: int, results: List[FileScanResult]
+    ) -> None:
+        self._current_processed = current
 
         if total > 0:
-            percent = int(current / total * 100)
+            self.progress_bar.setMaximum(100)
+            self.progress_bar.setValue(int(current / total * 100))
+            self.status_label.setText(f"Scanning {current} / {total}")
         else:
-            percent = 0
-        self.progress_bar.setValue(percent)
-        self.status_label.setText(f"Scanning {current} / {total}")
+            self.progress_bar.setMaximum(0)
+            self.status_label.setText(f"Scanning {current} / ?")
 
-        item = QListWidgetItem()
-        item_widget = ResultItemWidget(result, root=Path(self.folder_edit.text().strip()))
-        item.setSizeHint(item_widget.sizeHint())
-        self.results_list.addItem(item)
-        self.results_list.setItemWidget(item, item_widget)
+        self._pending_results.extend(results)
+
+    def _flush_results(self) -> None:
+        if not self._pending_results:
+            return
+
+        pending = self._pending_results
+        self._pending_results = []
+
+        self.results_list.setUpdatesEnabled(False)
+        self.results_list.blockSignals(True)
+        try:
+            for result in pending:
+                item = QListWidgetItem()
+                item.setData(Qt.ItemDataRole.UserRole, result)
+                item.setSizeHint(QSize(0, RESULT_ROW_HEIGHT))
+                self.results_list.addItem(item)
+        finally:
+            self.results_list.blockSignals(False)
+            self.results_list.setUpdatesEnabled(True)
+
+        self._materialize_visible_results()
+
+    def _materialize_visible_results(self, *_args) -> None:
+        count = self.results_list.count()
+        if count == 0:
+            return
+
+        viewport = self.results_list.viewport().rect()
+        first = self.results_list.indexAt(viewport.topLeft()).row()
+        last = self.results_list.indexAt(viewport.bottomLeft()).row()
+        if first < 0:
+            return
+        if last < 0:
+            last = count - 1
+
+        for row in range(first, last + 1):
+            item = self.results_list.item(row)
+            if self.results_list.itemWidget(item) is not None:
+                continue
+            result = item.data(Qt.ItemDataRole.UserRole)
+            item_widget = ResultItemWidget(result, root_prefix=self._scan_root_prefix)
+            item.setSizeHint(item_widget.sizeHint())
+            self.results_list.setItemWidget(item, item_widget)
 
     def on_finished(self, stats: dict) -> None:
         self.status_label.setText(
@@ -376,9 +521,12 @@ class MainWindow(QMainWindow):
         )
 
     def on_cancelled(self, stats: dict) -> None:
+        skipped = f"{stats.get('skipped', 0)}"
+        if stats.get("partial"):
+            skipped += "+ (folders not yet listed were not counted)"
         self.status_label.setText(
-            f"Cancelled. Processed: {self._current_total - stats.get('skipped', 0)}, "
-            f"Skipped: {stats.get('skipped', 0)}"
+            f"Cancelled. Processed: {self._current_processed}, "
+            f"Skipped: {skipped}"
         )
         self.statusBar().showMessage("Scan cancelled", 5000)
 
@@ -390,6 +538,7 @@ class MainWindow(QMainWindow):
 
 def main() -> None:
     app = QApplication(sys.argv)
+    QPixmapCache.setCacheLimit(THUMBNAIL_CACHE_LIMIT_KB)
     win = MainWindow()
     win.show()
     sys.exit(app.exec())